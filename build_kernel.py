@@ -0,0 +1,36 @@
+"""
+build_kernel.py
+~~~~~~~~~~~~~~~
+Ahead-of-time compile the Numba matching kernel into the ``fp_kernel``
+extension module.
+
+With plain ``@njit`` the first query of every CLI invocation pays the JIT
+compilation cost (or a cache lookup).  The prebuilt module is imported by
+:mod:`fingerprinter` when present, so matching starts immediately and no
+LLVM compilation happens at query time.  Run once after installing::
+
+    python build_kernel.py
+
+AOT-compiled code is not parallelised; :mod:`fingerprinter` falls back to
+the cached ``@njit`` kernel if the module has not been built.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from numba.pycc import CC
+
+from fingerprinter_numba import search_all
+
+
+cc = CC("fp_kernel")
+cc.output_dir = str(Path(__file__).resolve().parent)
+
+# (data, offsets, q) -> (video_index, frame_index, distance)
+cc.export("search_all", "Tuple((i8, i8, f8))(u1[:], i8[:], u1[:])")(search_all.py_func)
+
+
+if __name__ == "__main__":
+    cc.compile()
+    print(f"Built fp_kernel in '{cc.output_dir}'.")
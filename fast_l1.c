@@ -0,0 +1,263 @@
+/*
+ * fast_l1.c
+ * ~~~~~~~~~
+ * Optional C extension: sliding L1 (sum of absolute differences) search over
+ * uint8 fingerprints.
+ *
+ * The sliding L1 search is a classic SAD kernel, which x86 implements
+ * natively: _mm256_sad_epu8 computes 32 |u8 - u8| differences and partially
+ * sums them in a single instruction.  The AVX2 path is selected at runtime
+ * when the CPU supports it.  Otherwise, when every byte is below 0x80 (always
+ * true for fingerprints, whose values are at most a few tens), a SWAR kernel
+ * processes eight bytes per step in ordinary 64-bit registers; a plain
+ * scalar loop handles everything else.
+ *
+ * :func:`fingerprinter.find_best_video_in_db` calls best_match_u8 once per
+ * reference, so the kernel is chosen per reference.
+ *
+ * Build in place with::
+ *
+ *     python setup.py build_ext --inplace
+ *
+ * Defining FAST_L1_NO_AVX2 (FAST_L1_NO_AVX2=1 in the environment of the
+ * command above) leaves the AVX2 kernel out, so the SWAR and scalar paths
+ * can be exercised on AVX2 machines.  The module's AVX2 attribute reports
+ * whether the AVX2 kernel is in use.
+ */
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
+#include <stddef.h>
+#include <stdint.h>
+#include <string.h>
+
+#if defined(__GNUC__) && (defined(__x86_64__) || defined(__i386__)) && !defined(FAST_L1_NO_AVX2)
+#define FAST_L1_HAVE_AVX2 1
+#include <immintrin.h>
+#endif
+
+
+/* ------------------------------------------------------------------------ */
+/* Kernels                                                                   */
+/* ------------------------------------------------------------------------ */
+
+/* Return the SAD of the window at r against q, or any value >= best once the
+ * partial sum reaches best (early abandon). */
+static uint32_t
+window_sad_scalar(const uint8_t *q, const uint8_t *r, size_t m, uint32_t best)
+{
+    uint32_t s = 0;
+    for (size_t j = 0; j < m; j++) {
+        s += (uint32_t)(q[j] > r[j] ? q[j] - r[j] : r[j] - q[j]);
+        if (s >= best) {
+            break;
+        }
+    }
+    return s;
+}
+
+#define SWAR_LO7 0x7F7F7F7F7F7F7F7FULL
+#define SWAR_HI 0x8080808080808080ULL
+#define SWAR_LO8_OF16 0x00FF00FF00FF00FFULL
+
+static inline uint64_t
+load_u64(const uint8_t *p)
+{
+    uint64_t v;
+    memcpy(&v, p, sizeof v);
+    return v;
+}
+
+/* Sum of |a_i - b_i| over the eight byte lanes of a and b.  Every byte must
+ * be below 0x80, so 0x80 + a_i - b_i never borrows across lanes. */
+static inline uint32_t
+sad_swar(uint64_t a, uint64_t b)
+{
+    uint64_t d = (a | SWAR_HI) - b;              /* 0x80 + a_i - b_i */
+    uint64_t neg = ((~d & SWAR_HI) >> 7) * 0xFF; /* 0xFF where a_i < b_i */
+    uint64_t x = d & SWAR_LO7;                   /* a_i - b_i, or 0x80 + a_i - b_i */
+    uint64_t diff = (x & ~neg) | ((SWAR_HI - x) & neg);
+
+    /* Horizontal add: pairs into 16-bit lanes, then all four lanes at once. */
+    diff = (diff & SWAR_LO8_OF16) + ((diff >> 8) & SWAR_LO8_OF16);
+    return (uint32_t)((diff * 0x0001000100010001ULL) >> 48);
+}
+
+static uint32_t
+window_sad_swar(const uint8_t *q, const uint8_t *r, size_t m, uint32_t best)
+{
+    uint32_t s = 0;
+    size_t k = 0;
+
+    for (; k + 8 <= m; k += 8) {
+        s += sad_swar(load_u64(q + k), load_u64(r + k));
+        if (s >= best) {
+            return s;
+        }
+    }
+
+    return s + window_sad_scalar(q + k, r + k, m - k, best - s);
+}
+
+/* Return nonzero if every byte of p[0..n) is below 0x80. */
+static int
+all_below_0x80(const uint8_t *p, size_t n)
+{
+    uint64_t acc = 0;
+    size_t k = 0;
+    for (; k + 8 <= n; k += 8) {
+        acc |= load_u64(p + k);
+    }
+    for (; k < n; k++) {
+        acc |= p[k];
+    }
+    return (acc & SWAR_HI) == 0;
+}
+
+#ifdef FAST_L1_HAVE_AVX2
+__attribute__((target("avx2")))
+static uint32_t
+window_sad_avx2(const uint8_t *q, const uint8_t *r, size_t m, uint32_t best)
+{
+    uint32_t s = 0;
+    size_t k = 0;
+
+    /* 32 bytes per step; check the running sum after each block. */
+    for (; k + 32 <= m; k += 32) {
+        __m256i sad = _mm256_sad_epu8(
+            _mm256_loadu_si256((const __m256i *)(q + k)),
+            _mm256_loadu_si256((const __m256i *)(r + k)));
+        __m128i lanes = _mm_add_epi64(_mm256_castsi256_si128(sad),
+                                      _mm256_extracti128_si256(sad, 1));
+        lanes = _mm_add_epi64(lanes, _mm_unpackhi_epi64(lanes, lanes));
+        s += (uint32_t)_mm_cvtsi128_si32(lanes);
+        if (s >= best) {
+            return s;
+        }
+    }
+
+    /* One 16-byte step for the middle of the tail. */
+    if (k + 16 <= m) {
+        __m128i sad = _mm_sad_epu8(_mm_loadu_si128((const __m128i *)(q + k)),
+                                   _mm_loadu_si128((const __m128i *)(r + k)));
+        sad = _mm_add_epi64(sad, _mm_unpackhi_epi64(sad, sad));
+        s += (uint32_t)_mm_cvtsi128_si32(sad);
+        k += 16;
+        if (s >= best) {
+            return s;
+        }
+    }
+
+    return s + window_sad_scalar(q + k, r + k, m - k, best - s);
+}
+#endif
+
+typedef uint32_t (*window_sad_fn)(const uint8_t *, const uint8_t *, size_t, uint32_t);
+
+static int have_avx2 = 0;
+
+static window_sad_fn
+select_window_sad(const uint8_t *q, size_t m, const uint8_t *r, size_t n)
+{
+#ifdef FAST_L1_HAVE_AVX2
+    if (have_avx2) {
+        return window_sad_avx2;
+    }
+#endif
+    if (all_below_0x80(q, m) && all_below_0x80(r, n)) {
+        return window_sad_swar;
+    }
+    return window_sad_scalar;
+}
+
+/* Slide q (length m) over r (length n >= m).  Store the best offset in
+ * *out_idx and return its distance. */
+static uint32_t
+best_match_u8(const uint8_t *q, size_t m, const uint8_t *r, size_t n, uint32_t *out_idx)
+{
+    window_sad_fn window_sad = select_window_sad(q, m, r, n);
+    uint32_t best = UINT32_MAX;
+    uint32_t best_o = 0;
+
+    for (size_t o = 0; o + m <= n; o++) {
+        uint32_t s = window_sad(q, r + o, m, best);
+        if (s < best) {
+            best = s;
+            best_o = (uint32_t)o;
+        }
+    }
+
+    *out_idx = best_o;
+    return best;
+}
+
+
+/* ------------------------------------------------------------------------ */
+/* Python binding                                                            */
+/* ------------------------------------------------------------------------ */
+
+PyDoc_STRVAR(py_best_match_u8_doc,
+"best_match_u8(query, reference) -> (offset, distance)\n"
+"\n"
+"Slide *query* over *reference* (both contiguous uint8 buffers) and return\n"
+"the offset and integer L1 distance of the best window.  Returns\n"
+"``(-1, -1)`` if *query* is longer than *reference*.");
+
+static PyObject *
+py_best_match_u8(PyObject *self, PyObject *args)
+{
+    Py_buffer q, r;
+    uint32_t idx = 0, dist = 0;
+    int found;
+
+    if (!PyArg_ParseTuple(args, "y*y*:best_match_u8", &q, &r)) {
+        return NULL;
+    }
+
+    found = q.len <= r.len;
+    if (found) {
+        Py_BEGIN_ALLOW_THREADS
+        dist = best_match_u8((const uint8_t *)q.buf, (size_t)q.len,
+                             (const uint8_t *)r.buf, (size_t)r.len, &idx);
+        Py_END_ALLOW_THREADS
+    }
+
+    PyBuffer_Release(&q);
+    PyBuffer_Release(&r);
+
+    if (!found) {
+        return Py_BuildValue("(ii)", -1, -1);
+    }
+    return Py_BuildValue("(kk)", (unsigned long)idx, (unsigned long)dist);
+}
+
+static PyMethodDef fast_l1_methods[] = {
+    {"best_match_u8", py_best_match_u8, METH_VARARGS, py_best_match_u8_doc},
+    {NULL, NULL, 0, NULL},
+};
+
+static struct PyModuleDef fast_l1_module = {
+    PyModuleDef_HEAD_INIT,
+    "fast_l1",
+    "SAD-based sliding L1 search over uint8 fingerprints.",
+    -1,
+    fast_l1_methods,
+};
+
+PyMODINIT_FUNC
+PyInit_fast_l1(void)
+{
+    PyObject *m;
+
+#ifdef FAST_L1_HAVE_AVX2
+    __builtin_cpu_init();
+    have_avx2 = __builtin_cpu_supports("avx2");
+#endif
+    m = PyModule_Create(&fast_l1_module);
+    if (m != NULL && PyModule_AddIntConstant(m, "AVX2", have_avx2 != 0) < 0) {
+        Py_DECREF(m);
+        return NULL;
+    }
+    return m;
+}
@@ -7,6 +7,12 @@ A "fingerprint" is a per-second amplitude envelope: for every one-second
 chunk of an audio file, we record the peak absolute amplitude rounded to
 one decimal place.  Matching is done by sliding the query fingerprint over
 each reference fingerprint and minimising the L1 distance.
+
+In memory, fingerprints are ``uint8`` arrays holding the amplitude in tenths
+(``0.7`` is stored as ``7``).  This is exact for one-decimal values, moves a
+quarter of the bytes a float32 envelope would, and keeps L1 distances in
+integer arithmetic.  Distances returned by this module are converted back to
+amplitude units.
 """
 
 from __future__ import annotations
@@ -15,15 +21,32 @@ import math
 from pathlib import Path
 from typing import Sequence
 
-import librosa
 import numpy as np
 
+from fingerprinter_numba import peak_abs, search_all
+from reference_store import FINGERPRINT_DTYPE, FINGERPRINT_SCALE, concat_references
+
+try:
+    import fast_l1  # optional C extension; see setup.py
+except ImportError:
+    fast_l1 = None
+
+try:
+    import fp_kernel  # optional AOT-compiled search_all; see build_kernel.py
+except ImportError:
+    fp_kernel = None
+
+
+#: Largest ``(n_refs, n_offsets, m)`` broadcast that :func:`find_best_video_in_db`
+#: will evaluate with NumPy instead of calling a Numba kernel (int16 elements).
+BATCH_MAX_ELEMENTS = 32 * 1024 * 1024
+
 
 # ---------------------------------------------------------------------------
 # Fingerprint extraction
 # ---------------------------------------------------------------------------
 
-def extract_fingerprint(audio_path: str | Path) -> list[float]:
+def extract_fingerprint(audio_path: str | Path) -> np.ndarray:
     """
     Load an audio file and return its per-second amplitude envelope.
 
@@ -31,6 +54,11 @@ def extract_fingerprint(audio_path: str | Path) -> list[float]:
     rounded to one decimal place.  The final (potentially partial) second is
     discarded so every element represents a full second.
 
+    Audio is always read at its native sample rate and down-mixed to mono.
+    Files libsndfile can read (WAV, FLAC, …) are decoded one second at a
+    time, so the whole signal is never held in memory.  Anything else goes
+    through :func:`librosa.load`.
+
     Parameters
     ----------
     audio_path:
@@ -38,27 +66,58 @@ def extract_fingerprint(audio_path: str | Path) -> list[float]:
 
     Returns
     -------
-    list[float]
-        Per-second amplitude envelope.
+    np.ndarray
+        Per-second amplitude envelope as a ``FINGERPRINT_DTYPE`` array in
+        units of ``1 / FINGERPRINT_SCALE``.
+
+    Raises
+    ------
+    FileNotFoundError
+        If *audio_path* does not exist.
     """
-    y, sr = librosa.load(str(audio_path))
-    chunks = [y[offset : offset + sr] for offset in range(0, len(y), sr)]
-    chunks.pop()  # drop the last (partial) second
-    return [round(float(np.max(np.abs(chunk))), 1) for chunk in chunks]
+    # Imported here so matching-only code paths never load the audio stack
+    import soundfile as sf
+
+    # libsndfile reports a missing file like an unsupported format; don't
+    # send it through the librosa fallback.
+    if not Path(audio_path).is_file():
+        raise FileNotFoundError(f"No such audio file: '{audio_path}'")
+    try:
+        audio = sf.SoundFile(str(audio_path))
+    except sf.LibsndfileError:  # format not supported by libsndfile
+        return _extract_fingerprint_librosa(audio_path)
+
+    with audio:
+        sr = audio.samplerate
+        n_chunks = audio.frames // sr  # the last (partial) second is dropped
+        peaks = np.empty(n_chunks, dtype=FINGERPRINT_DTYPE)
+        blocks = audio.blocks(blocksize=sr, frames=n_chunks * sr, dtype="float32")
+        for k, block in enumerate(blocks):
+            if block.ndim > 1:
+                block = block.mean(axis=1)  # down-mix to mono, as librosa does
+            peak_abs(block.reshape(1, sr), peaks[k : k + 1])
+    return peaks
+
+
+def _extract_fingerprint_librosa(audio_path: str | Path) -> np.ndarray:
+    """Fallback for :func:`extract_fingerprint`: decode the whole file with librosa."""
+    import librosa  # slow to import; only needed for formats libsndfile can't read
+
+    # Native rate (no resampling), so the envelope matches the soundfile path.
+    y, sr = librosa.load(str(audio_path), sr=None)
+    n_chunks = len(y) // sr  # the last (partial) second is dropped
+    peaks = np.empty(n_chunks, dtype=FINGERPRINT_DTYPE)
+    peak_abs(y[: n_chunks * sr].reshape(n_chunks, sr), peaks)
+    return peaks
 
 
 # ---------------------------------------------------------------------------
 # Fingerprint matching
 # ---------------------------------------------------------------------------
 
-def _l1_distance(query: Sequence[float], reference: Sequence[float], offset: int) -> float:
-    """Return the L1 distance between *query* and the *reference* window at *offset*."""
-    return sum(abs(q - reference[offset + j]) for j, q in enumerate(query))
-
-
 def best_match_position(
-    query: Sequence[float],
-    reference: Sequence[float],
+    query: Sequence[int],
+    reference: Sequence[int],
 ) -> tuple[int, float]:
     """
     Slide *query* over *reference* and find the window with the smallest L1 distance.
@@ -81,21 +140,29 @@ def best_match_position(
     if max_offset < 0:
         return -1, math.inf
 
-    best_offset = -1
-    best_distance = math.inf
+    if fast_l1 is not None:
+        offset, distance = fast_l1.best_match_u8(
+            np.ascontiguousarray(query, dtype=FINGERPRINT_DTYPE),
+            np.ascontiguousarray(reference, dtype=FINGERPRINT_DTYPE),
+        )
+        return offset, distance / FINGERPRINT_SCALE
+
+    # Widen to int16 so the uint8 differences cannot wrap.
+    query_arr = np.asarray(query, dtype=np.int16)
+    reference_arr = np.asarray(reference, dtype=np.int16)
 
-    for offset in range(max_offset + 1):
-        dist = _l1_distance(query, reference, offset)
-        if dist < best_distance:
-            best_distance = dist
-            best_offset = offset
+    # Strided (max_offset + 1, m) view over the reference — no copy is made,
+    # and the whole sliding search reduces to two ufuncs.
+    windows = np.lib.stride_tricks.sliding_window_view(reference_arr, len(query_arr))
+    distances = np.abs(windows - query_arr).sum(axis=1, dtype=np.int64)
 
-    return best_offset, best_distance
+    best_offset = int(distances.argmin())
+    return best_offset, float(distances[best_offset]) / FINGERPRINT_SCALE
 
 
 def find_best_video(
-    query: Sequence[float],
-    references: Sequence[Sequence[float]],
+    query: Sequence[int],
+    references: Sequence[Sequence[int]],
 ) -> tuple[int, int, float]:
     """
     Find the reference video that best matches *query*.
@@ -114,15 +181,109 @@ def find_best_video(
         *frame_index* is the second-offset within that video.
         *distance* is the raw L1 cost.
     """
-    best_video = -1
-    best_frame = -1
-    best_distance = math.inf
-
-    for video_idx, ref in enumerate(references):
-        frame, dist = best_match_position(query, ref)
-        if dist < best_distance:
-            best_distance = dist
-            best_frame = frame
-            best_video = video_idx
-
-    return best_video, best_frame, best_distance
+    query_arr = np.asarray(query, dtype=FINGERPRINT_DTYPE)
+    m = len(query_arr)
+
+    # References shorter than the query can never match; leave them out of
+    # the database entirely rather than searching them.
+    usable = [i for i, ref in enumerate(references) if len(ref) >= m]
+    if not usable:
+        return -1, -1, math.inf
+
+    data, offsets = concat_references([references[i] for i in usable])
+    video_idx, frame, distance = find_best_video_in_db(query_arr, data, offsets)
+    return usable[video_idx], frame, distance
+
+
+def find_best_video_in_db(
+    query: Sequence[int],
+    data: np.ndarray,
+    offsets: np.ndarray,
+) -> tuple[int, int, float]:
+    """
+    Like :func:`find_best_video`, but for references already concatenated
+    by :func:`reference_store.concat_references` (e.g. the memory-mapped
+    database opened by :func:`reference_store.open_db`).
+
+    Reference *i* is ``data[offsets[i]:offsets[i + 1]]``; the kernels read
+    it in place, so a memory-mapped *data* is only paged in as it is
+    searched.
+
+    When neither prebuilt kernel is available and the database is too large
+    for the NumPy path, the on-disk-cached :func:`fingerprinter_numba.search_all`
+    is used.
+    """
+    query_arr = np.asarray(query, dtype=FINGERPRINT_DTYPE)
+    data = np.asarray(data, dtype=FINGERPRINT_DTYPE)  # a view, even for np.memmap
+    offsets = np.asarray(offsets, dtype=np.int64)
+
+    # Prefer the prebuilt kernels, which have no JIT warm-up on the first
+    # call: the SIMD SAD extension, then the AOT-compiled Numba kernel.
+    # Without either, a small database is cheaper to search in one NumPy
+    # broadcast than to load even the cached Numba kernel for.
+    m = len(query_arr)
+    max_len = int(np.diff(offsets).max()) if len(offsets) > 1 else 0
+    batch_elements = (len(offsets) - 1) * max(max_len - m + 1, 0) * m
+    if fast_l1 is not None:
+        kernel = _search_all_fast_l1
+    elif fp_kernel is not None:
+        kernel = fp_kernel.search_all
+    elif 0 < batch_elements <= BATCH_MAX_ELEMENTS:
+        kernel = _search_all_numpy
+    else:
+        kernel = search_all
+    video_idx, frame, distance = kernel(data, offsets, query_arr)
+    return int(video_idx), int(frame), float(distance) / FINGERPRINT_SCALE
+
+
+def _search_all_fast_l1(
+    data: np.ndarray,
+    offsets: np.ndarray,
+    q: np.ndarray,
+) -> tuple[int, int, float]:
+    """
+    :func:`fingerprinter_numba.search_all` on top of the ``fast_l1`` extension.
+
+    Each reference is passed to :func:`fast_l1.best_match_u8` as a slice of
+    *data* (a view, so nothing is copied).  Returns ``(-1, -1, inf)`` if *q*
+    is longer than every reference.
+    """
+    q = np.ascontiguousarray(q)
+    best_video, best_frame, best_distance = -1, -1, math.inf
+    for i in range(len(offsets) - 1):
+        start, end = int(offsets[i]), int(offsets[i + 1])
+        if end - start < len(q):
+            continue
+        frame, distance = fast_l1.best_match_u8(q, data[start:end])
+        if distance < best_distance:
+            best_video, best_frame, best_distance = i, frame, distance
+    return best_video, best_frame, float(best_distance)
+
+
+def _search_all_numpy(
+    data: np.ndarray,
+    offsets: np.ndarray,
+    q: np.ndarray,
+) -> tuple[int, int, float]:
+    """
+    NumPy equivalent of :func:`fingerprinter_numba.search_all`.
+
+    Every reference is padded into one ``(n_refs, max_len)`` matrix so the
+    distances for all ``(reference, offset)`` pairs come out of a single
+    broadcast over a ``(n_refs, n_offsets, m)`` window view.  Windows that
+    run past the end of their reference are masked out.  Requires
+    ``len(q) >= 1`` and at least one reference as long as *q*.
+    """
+    m = len(q)
+    lens = np.diff(offsets)
+    max_len = int(lens.max())
+
+    padded = np.zeros((len(lens), max_len), dtype=np.int16)
+    padded[np.arange(max_len) < lens[:, None]] = data  # row-major, so rows fill in order
+
+    windows = np.lib.stride_tricks.sliding_window_view(padded, m, axis=1)
+    distances = np.abs(windows - q.astype(np.int16)).sum(axis=2, dtype=np.int64)
+    distances[np.arange(distances.shape[1]) > (lens - m)[:, None]] = np.iinfo(np.int64).max
+
+    video_idx, frame = np.unravel_index(distances.argmin(), distances.shape)
+    return int(video_idx), int(frame), float(distances[video_idx, frame])
@@ -0,0 +1,143 @@
+"""
+fingerprinter_numba.py
+~~~~~~~~~~~~~~~~~~~~~~
+Numba-compiled kernels backing :mod:`fingerprinter`.
+
+The envelope kernel computes every per-second peak in a single pass over
+the samples, without materialising an ``abs(chunk)`` temporary.
+
+The matching kernel works on every reference concatenated into one flat
+buffer plus an offsets vector (reference *i* is
+``data[offsets[i]:offsets[i + 1]]``), so that the whole database — possibly
+memory-mapped — can be searched in a single compiled call, with the outer
+loop over references distributed across CPU cores.  Each window's distance
+is accumulated with early abandoning: summation stops as soon as
+the partial sum can no longer beat the best window seen so far.  Before
+that, ``|sum(q) - sum(window)|`` — a lower bound on the window's L1
+distance, available in O(1) from prefix sums of the reference — lets most
+hopeless windows be skipped without touching their elements.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+from numba import njit, prange
+
+
+@njit(cache=True, fastmath=True)
+def peak_abs(frames, out):
+    """
+    Write the peak absolute amplitude of each row of *frames* to *out*.
+
+    *frames* is an ``(n_chunks, sr)`` view of the signal, one second per
+    row.  Each peak is stored as an integer in tenths (``round(peak * 10)``).
+    """
+    for k in range(frames.shape[0]):
+        peak = 0.0
+        for j in range(frames.shape[1]):
+            v = frames[k, j]
+            a = v if v >= 0 else -v
+            if a > peak:
+                peak = a
+        out[k] = round(peak * 10)
+
+
+@njit(cache=True)
+def _prefix_sums(a):
+    """Return ``p`` with ``p[k] == sum(a[:k])`` as int64 (length ``len(a) + 1``)."""
+    p = np.empty(a.shape[0] + 1, dtype=np.int64)
+    p[0] = 0
+    for k in range(a.shape[0]):
+        p[k + 1] = p[k] + a[k]
+    return p
+
+
+# The matching kernels use inf as "no match yet", which fastmath's ninf flag
+# would make undefined, so they are compiled with strict IEEE semantics.
+@njit(cache=True)
+def best_match_numba(q, ref):
+    """
+    Slide *q* over *ref* and return ``(offset, distance)`` of the best window.
+
+    Windows whose sum differs from the query's by at least the best distance
+    found so far are skipped outright (that difference is a lower bound on
+    their L1 distance).  The rest are abandoned once their partial L1 sum
+    reaches the best distance, so strongly mismatching windows cost only a
+    few element comparisons.  Returns ``(-1, inf)`` if *q* is longer than
+    *ref*.
+    """
+    m = q.shape[0]
+    best = np.inf
+    best_o = -1
+    if ref.shape[0] < m:
+        return best_o, best
+
+    prefix = _prefix_sums(ref)
+    q_sum = _prefix_sums(q)[m]
+    for o in range(ref.shape[0] - m + 1):
+        if abs(q_sum - (prefix[o + m] - prefix[o])) >= best:
+            continue
+        s = 0
+        for j in range(m):
+            # Widen before subtracting: uint8 differences would wrap.
+            s += abs(np.int32(q[j]) - np.int32(ref[o + j]))
+            if s >= best:
+                break
+        if s < best:
+            best = s
+            best_o = o
+    return best_o, best
+
+
+@njit(parallel=True, cache=True)
+def search_all(data, offsets, q):
+    """
+    Slide *q* over every reference in *data* and return the best overall match.
+
+    Parameters
+    ----------
+    data:
+        uint8 buffer holding every reference back to back.
+    offsets:
+        int64 vector of length ``n_refs + 1``; reference *i* is
+        ``data[offsets[i]:offsets[i + 1]]``.
+    q:
+        Query fingerprint as a uint8 array.
+
+    Returns
+    -------
+    (video_index, frame_index, distance)
+        *distance* is in the fingerprints' integer units.  ``(-1, -1, inf)``
+        if *q* is longer than every reference.
+    """
+    n_refs = offsets.shape[0] - 1
+    m = q.shape[0]
+
+    # Per-reference results; reduced serially below to avoid racing on a
+    # shared best-so-far from inside the parallel loop.
+    best_frames = np.full(n_refs, -1, dtype=np.int64)
+    best_dists = np.full(n_refs, np.inf, dtype=np.float64)
+
+    for i in prange(n_refs):
+        if offsets[i + 1] - offsets[i] < m:
+            continue
+        best_o, best = best_match_numba(q, data[offsets[i] : offsets[i + 1]])
+        best_frames[i] = best_o
+        best_dists[i] = best
+
+    return _reduce_best(best_frames, best_dists)
+
+
+@njit(cache=True)
+def _reduce_best(best_frames, best_dists):
+    """Return ``(video_index, frame_index, distance)`` of the smallest per-reference distance."""
+    best_video = -1
+    best_frame = -1
+    best_dist = np.inf
+    for i in range(best_dists.shape[0]):
+        if best_dists[i] < best_dist:
+            best_dist = best_dists[i]
+            best_frame = best_frames[i]
+            best_video = i
+
+    return best_video, best_frame, best_dist
@@ -28,16 +28,17 @@ Examples
 from __future__ import annotations
 
 import argparse
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from fingerprinter import extract_fingerprint, find_best_video
-from reference_store import (
-    FINGERPRINT_DIR,
-    load_all_fingerprints,
-    save_fingerprint,
-    iter_video_paths,
-)
+# The fingerprinting and storage modules pull in NumPy, Numba and the audio
+# stack, so they are imported inside the functions that need them; that
+# keeps --help and usage errors instant.
+if TYPE_CHECKING:
+    import numpy as np
 
 
 # ---------------------------------------------------------------------------
@@ -57,18 +58,47 @@ def build_index(audio_dir: Path, count: int) -> None:
     count:
         Number of reference videos to index.
     """
+    from reference_store import (
+        FINGERPRINT_DIR,
+        iter_video_paths,
+        load_all_fingerprints,
+        save_all_fingerprints,
+        save_fingerprint,
+    )
+
     print(f"Building fingerprint index from {audio_dir!s} ({count} videos)…")
+    tasks = []
     for idx, audio_path in iter_video_paths(audio_dir, count, extension=".wav"):
         if not audio_path.exists():
             print(f"  [SKIP] {audio_path} not found.")
             continue
-        print(f"  Indexing video {idx}: {audio_path.name}", end="", flush=True)
-        fingerprint = extract_fingerprint(audio_path)
+        tasks.append((idx, audio_path))
+
+    # Every file is independent and decoding is CPU-bound, so fan the work
+    # out across processes; results come back in submission order.  Nothing
+    # is written until every file has been fingerprinted, so a failure
+    # leaves the existing index untouched.
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        fingerprints = list(executor.map(_extract_one, tasks))
+
+    for (idx, audio_path), fingerprint in zip(tasks, fingerprints):
         save_fingerprint(fingerprint, idx)
-        print(f"  ({len(fingerprint)} seconds)")
+        print(f"  Indexed video {idx}: {audio_path.name}  ({len(fingerprint)} seconds)")
+
+    # Consolidate everything on disk (including previously indexed videos)
+    # into the binary database used at query time.
+    save_all_fingerprints(load_all_fingerprints())
     print(f"Done. Fingerprints saved to '{FINGERPRINT_DIR}/'.")
 
 
+def _extract_one(task: tuple[int, Path]) -> np.ndarray:
+    """Worker for :func:`build_index`: fingerprint one ``(index, path)`` task."""
+    from fingerprinter import extract_fingerprint
+
+    _, audio_path = task
+    return extract_fingerprint(audio_path)
+
+
 # ---------------------------------------------------------------------------
 # Query
 # ---------------------------------------------------------------------------
@@ -85,20 +115,28 @@ def run_query(query_audio: Path, query_video: Path) -> None:
         Path to the query video clip (used only to determine the video
         extension; the *matched* reference video is what gets played).
     """
-    # Load reference fingerprints
-    references = load_all_fingerprints()
-    if not references:
+    from fingerprinter import extract_fingerprint, find_best_video_in_db
+    from reference_store import FINGERPRINT_DIR, concat_references, load_all_fingerprints, open_db
+
+    # Open the reference database, falling back to the per-video files if
+    # it is missing or out of date
+    database = open_db()
+    if database is None:
+        database = concat_references(load_all_fingerprints())
+    data, offsets = database
+    n_references = len(offsets) - 1
+    if n_references == 0:
         sys.exit(
             f"No fingerprints found in '{FINGERPRINT_DIR}/'. "
             "Run with --build-index first."
         )
 
-    print(f"Loaded {len(references)} reference fingerprints.")
+    print(f"Loaded {n_references} reference fingerprints.")
     print(f"Extracting query fingerprint from '{query_audio}'…")
     query_fp = extract_fingerprint(query_audio)
     print(f"Query length: {len(query_fp)} second(s).")
 
-    video_idx, frame, distance = find_best_video(query_fp, references)
+    video_idx, frame, distance = find_best_video_in_db(query_fp, data, offsets)
     video_number = video_idx + 1  # convert to 1-based
 
     print(f"\n— Match found —")
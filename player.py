@@ -11,7 +11,6 @@ from __future__ import annotations
 
 import os
 import platform
-import sys
 
 import vlc
 from PyQt5 import QtCore, QtGui, QtWidgets
@@ -48,6 +47,7 @@ class Player(QtWidgets.QMainWindow):
         self._player = self._instance.media_player_new()
 
         self._build_ui()
+        self._attach_events()
         self._load_media(video_path, start_second)
         self._attach_window()
 
@@ -115,15 +115,25 @@ class Player(QtWidgets.QMainWindow):
         open_action = QtWidgets.QAction("Open File…", self)
         quit_action = QtWidgets.QAction("Quit", self)
         open_action.triggered.connect(self._on_open_file)
-        quit_action.triggered.connect(sys.exit)
+        quit_action.triggered.connect(self.close)
         file_menu.addAction(open_action)
         file_menu.addSeparator()
         file_menu.addAction(quit_action)
 
-        # Refresh timer (100 ms)
-        self._timer = QtCore.QTimer(self)
-        self._timer.setInterval(100)
-        self._timer.timeout.connect(self._update_ui)
+    def _attach_events(self) -> None:
+        """Refresh the UI from VLC's own events rather than polling it."""
+        # Keep a reference: python-vlc stores the callbacks on this object.
+        self._events = self._player.event_manager()
+        self._events.event_attach(vlc.EventType.MediaPlayerPositionChanged, self._on_vlc_event)
+        self._events.event_attach(vlc.EventType.MediaPlayerEndReached, self._on_vlc_event)
+
+    def closeEvent(self, event: QtGui.QCloseEvent) -> None:
+        """Detach the VLC callbacks and stop playback before the window goes away."""
+        # Otherwise VLC keeps calling _on_vlc_event on a deleted window.
+        self._events.event_detach(vlc.EventType.MediaPlayerPositionChanged)
+        self._events.event_detach(vlc.EventType.MediaPlayerEndReached)
+        self._player.stop()
+        super().closeEvent(event)
 
     def _load_media(self, path: str, start_second: int) -> None:
         """Load *path* into the player, starting at *start_second*."""
@@ -155,7 +165,6 @@ class Player(QtWidgets.QMainWindow):
             self._player.pause()
             self._play_btn.setText("Play")
             self._is_paused = True
-            self._timer.stop()
         else:
             if self._player.play() == -1:
                 self._on_open_file()
@@ -163,7 +172,6 @@ class Player(QtWidgets.QMainWindow):
             self._player.play()
             self._play_btn.setText("Pause")
             self._is_paused = False
-            self._timer.start()
 
     def reset_to_match(self) -> None:
         """Stop playback and restart from the detected match position."""
@@ -172,16 +180,17 @@ class Player(QtWidgets.QMainWindow):
         self._player.play()
         self._play_btn.setText("Pause")
         self._is_paused = False
-        self._timer.start()
 
     # ------------------------------------------------------------------
     # Slots
     # ------------------------------------------------------------------
 
     def _on_seek(self) -> None:
-        self._timer.stop()
         self._player.set_position(self._seek_slider.value() / 1000.0)
-        self._timer.start()
+
+    def _on_vlc_event(self, event: vlc.Event) -> None:
+        """Called on a VLC thread; defer the UI update to the Qt event loop."""
+        QtCore.QMetaObject.invokeMethod(self, "_update_ui", QtCore.Qt.QueuedConnection)
 
     def _on_open_file(self) -> None:
         filename, _ = QtWidgets.QFileDialog.getOpenFileName(
@@ -196,12 +205,13 @@ class Player(QtWidgets.QMainWindow):
         self._attach_window()
         self.play_pause()
 
+    @QtCore.pyqtSlot()
     def _update_ui(self) -> None:
         """Sync the seek slider with the current playback position."""
-        pos = int(self._player.get_position() * 1000)
-        self._seek_slider.setValue(pos)
+        # Don't fight the user while they are dragging the slider.
+        if not self._seek_slider.isSliderDown():
+            pos = int(self._player.get_position() * 1000)
+            self._seek_slider.setValue(pos)
 
-        if not self._player.is_playing():
-            self._timer.stop()
-            if not self._is_paused:
-                self.reset_to_match()
+        if not self._player.is_playing() and not self._is_paused:
+            self.reset_to_match()
@@ -3,37 +3,109 @@ reference_store.py
 ~~~~~~~~~~~~~~~~~~
 Utilities for saving and loading pre-computed reference fingerprints.
 
-Fingerprints are stored as plain JSON files — one file per video — so they
-can be inspected, version-controlled, and recomputed independently of the
-GUI or matching code.
+Fingerprints are stored one file per video so they can be recomputed
+independently of the GUI or matching code.  Each ``.bin`` file is the raw
+in-memory fingerprint (a ``FINGERPRINT_DTYPE`` array in units of
+``1 / FINGERPRINT_SCALE``, one byte per second) behind a 4-byte little-endian
+length header, so loading is a single read with no parsing.  Older JSON
+indexes (lists of one-decimal amplitudes) are still read when no ``.bin``
+file exists for a video, with a warning: they were built from audio
+resampled to 22 050 Hz, whereas fingerprints are now taken at the native
+sample rate, so matches against them are less reliable until the index is
+rebuilt.
+
+Alongside the per-video files, :func:`save_all_fingerprints` writes a single
+database that queries use instead: ``data.bin`` holds every fingerprint back
+to back and ``offsets.npy`` records where each one starts.
+:func:`open_db` memory-maps ``data.bin``, so opening the database costs the
+same regardless of its size and references are paged in only when searched.
+Every file is written under a temporary name and renamed into place, and
+:func:`open_db` ignores a database older than any per-video file, so a
+partial rebuild never serves stale fingerprints.
 
 Directory layout expected / produced by this module::
 
     fingerprints/
-        video1.json
-        video2.json
+        data.bin
+        offsets.npy
+        video1.bin
+        video2.bin
         ...
-        video20.json
+        video20.bin
 """
 
 from __future__ import annotations
 
 import json
+import os
+import warnings
 from pathlib import Path
-from typing import Iterator
+from typing import Iterator, Sequence
+
+import numpy as np
+
+
+#: In-memory element type of a fingerprint.
+FINGERPRINT_DTYPE = np.uint8
 
+#: Fingerprint values are amplitudes multiplied by this factor.
+FINGERPRINT_SCALE = 10
 
 FINGERPRINT_DIR = Path("fingerprints")
+DATABASE_DATA_NAME = "data.bin"
+DATABASE_OFFSETS_NAME = "offsets.npy"
 
+# Length prefix written ahead of each per-video binary fingerprint.
+_HEADER_DTYPE = np.dtype("<u4")
 
-def _path_for(video_index: int, directory: Path = FINGERPRINT_DIR) -> Path:
-    """Return the JSON path for a 1-based *video_index*."""
-    return directory / f"video{video_index}.json"
+_LEGACY_WARNING = (
+    "JSON indexes were built from audio resampled to 22050 Hz and may match "
+    "poorly; rebuild with build-index."
+)
 
 
-def save_fingerprint(fingerprint: list[float], video_index: int, directory: Path = FINGERPRINT_DIR) -> None:
+def _path_for(video_index: int, directory: Path = FINGERPRINT_DIR, suffix: str = ".bin") -> Path:
+    """Return the fingerprint path for a 1-based *video_index*."""
+    return directory / f"video{video_index}{suffix}"
+
+
+def _write_atomic(path: Path, write) -> None:
     """
-    Persist *fingerprint* to disk as JSON.
+    Call ``write(f)`` on a temporary file next to *path*, then move it into place.
+
+    Readers therefore see either the previous file or the complete new one,
+    never a partially written file.
+    """
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def _read_bin(path: Path) -> np.ndarray:
+    """Read a length-prefixed binary fingerprint file."""
+    with path.open("rb") as f:
+        header = np.fromfile(f, dtype=_HEADER_DTYPE, count=1)
+        fingerprint = np.fromfile(f, dtype=FINGERPRINT_DTYPE)
+    if len(header) != 1 or int(header[0]) != len(fingerprint):
+        raise ValueError(f"Corrupt fingerprint file: {path}")
+    return fingerprint
+
+
+def _read_json(path: Path) -> np.ndarray:
+    """Read a legacy JSON fingerprint file (a list of one-decimal amplitudes)."""
+    values = json.loads(path.read_text())
+    return np.array([round(v * FINGERPRINT_SCALE) for v in values], dtype=FINGERPRINT_DTYPE)
+
+
+def _read(path: Path) -> np.ndarray:
+    """Read a fingerprint file in whichever format its suffix indicates."""
+    return _read_json(path) if path.suffix == ".json" else _read_bin(path)
+
+
+def save_fingerprint(fingerprint: np.ndarray, video_index: int, directory: Path = FINGERPRINT_DIR) -> None:
+    """
+    Persist *fingerprint* to disk as a length-prefixed binary file.
 
     Parameters
     ----------
@@ -42,14 +114,19 @@ def save_fingerprint(fingerprint: list[float], video_index: int, directory: Path
     video_index:
         1-based video number (determines the filename).
     directory:
-        Directory in which to write the JSON files.  Created if absent.
+        Directory in which to write the fingerprint files.  Created if absent.
     """
     directory.mkdir(parents=True, exist_ok=True)
-    path = _path_for(video_index, directory)
-    path.write_text(json.dumps(fingerprint, separators=(",", ":")))
+    fingerprint = np.ascontiguousarray(fingerprint, dtype=FINGERPRINT_DTYPE)
+
+    def _write(f) -> None:
+        np.array([len(fingerprint)], dtype=_HEADER_DTYPE).tofile(f)
+        fingerprint.tofile(f)
 
+    _write_atomic(_path_for(video_index, directory), _write)
 
-def load_fingerprint(video_index: int, directory: Path = FINGERPRINT_DIR) -> list[float]:
+
+def load_fingerprint(video_index: int, directory: Path = FINGERPRINT_DIR) -> np.ndarray:
     """
     Load a single pre-computed fingerprint from disk.
 
@@ -57,30 +134,134 @@ def load_fingerprint(video_index: int, directory: Path = FINGERPRINT_DIR) -> lis
     ------
     FileNotFoundError
         If no fingerprint has been saved for *video_index*.
+    ValueError
+        If the file's length header does not match its contents.
     """
     path = _path_for(video_index, directory)
-    return json.loads(path.read_text())
+    if not path.exists():
+        legacy = _path_for(video_index, directory, suffix=".json")
+        if legacy.exists():
+            warnings.warn(f"Reading legacy fingerprint '{legacy}'. {_LEGACY_WARNING}", stacklevel=2)
+            path = legacy
+    return _read(path)
 
 
-def load_all_fingerprints(directory: Path = FINGERPRINT_DIR) -> list[list[float]]:
+def load_all_fingerprints(directory: Path = FINGERPRINT_DIR) -> list[np.ndarray]:
     """
     Load every fingerprint found in *directory*, sorted by video index.
 
     Returns
     -------
-    list[list[float]]
+    list[np.ndarray]
         Fingerprints in ascending video-index order.  Empty list if the
-        directory does not exist or contains no ``*.json`` files.
+        directory does not exist or contains no fingerprint files.
     """
+    paths = _fingerprint_paths(directory)
+    legacy = [p for p in paths if p.suffix == ".json"]
+    if legacy:
+        warnings.warn(
+            f"Reading {len(legacy)} legacy fingerprint(s) from '{directory}'. {_LEGACY_WARNING}",
+            stacklevel=2,
+        )
+    return [_read(path) for path in paths]
+
+
+def _fingerprint_paths(directory: Path) -> list[Path]:
+    """Return the per-video fingerprint file to read for each video, by index."""
     if not directory.exists():
         return []
 
     def _index(p: Path) -> int:
-        # Expect filenames like "video3.json"
+        # Expect filenames like "video3.bin"
         return int("".join(filter(str.isdigit, p.stem)) or -1)
 
-    paths = sorted(directory.glob("video*.json"), key=_index)
-    return [json.loads(p.read_text()) for p in paths]
+    # Legacy JSON first so a .bin file for the same video replaces it.
+    paths = {_index(p): p for p in directory.glob("video*.json")}
+    paths.update({_index(p): p for p in directory.glob("video*.bin")})
+    return [paths[i] for i in sorted(paths)]
+
+
+def concat_references(
+    references: Sequence[Sequence[int]],
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Concatenate *references* into one flat buffer.
+
+    Returns
+    -------
+    (data, offsets)
+        *data* is a ``FINGERPRINT_DTYPE`` array holding every reference back
+        to back.  *offsets* is an int64 vector of length ``n_refs + 1`` such
+        that reference *i* is ``data[offsets[i]:offsets[i + 1]]``.
+    """
+    offsets = np.zeros(len(references) + 1, dtype=np.int64)
+    np.cumsum([len(ref) for ref in references], out=offsets[1:])
+    data = np.empty(int(offsets[-1]), dtype=FINGERPRINT_DTYPE)
+    for i, ref in enumerate(references):
+        data[offsets[i] : offsets[i + 1]] = ref
+    return data, offsets
+
+
+def save_all_fingerprints(fingerprints: list[np.ndarray], directory: Path = FINGERPRINT_DIR) -> None:
+    """
+    Persist *fingerprints* as the concatenated database read by :func:`open_db`.
+
+    Parameters
+    ----------
+    fingerprints:
+        Fingerprints in ascending video-index order (as returned by
+        :func:`load_all_fingerprints`).
+    directory:
+        Directory in which to write the database.  Created if absent.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    data, offsets = concat_references(fingerprints)
+    # Offsets last: open_db compares the older of the two files against the
+    # per-video fingerprints.
+    _write_atomic(directory / DATABASE_DATA_NAME, data.tofile)
+    _write_atomic(directory / DATABASE_OFFSETS_NAME, lambda f: np.save(f, offsets))
+
+
+def open_db(directory: Path = FINGERPRINT_DIR) -> tuple[np.ndarray, np.ndarray] | None:
+    """
+    Open the database written by :func:`save_all_fingerprints` without reading it.
+
+    Returns
+    -------
+    (data, offsets) or None
+        *data* is a read-only memory map over every fingerprint and
+        *offsets* the vector such that video *i* (0-based) is
+        ``data[offsets[i]:offsets[i + 1]]``, as produced by
+        :func:`concat_references`.  ``None`` if no database has been
+        built in *directory*, or if it is out of date: the number of
+        per-video fingerprint files differs from the number of videos in
+        the database, or one of them was written after it (e.g. by an
+        interrupted ``build-index``).  Callers should then fall back to
+        :func:`load_all_fingerprints`.
+
+    Raises
+    ------
+    ValueError
+        If the data file's size does not match the offsets.
+    """
+    data_path = directory / DATABASE_DATA_NAME
+    offsets_path = directory / DATABASE_OFFSETS_NAME
+    if not (data_path.exists() and offsets_path.exists()):
+        return None
+
+    built = min(data_path.stat().st_mtime_ns, offsets_path.stat().st_mtime_ns)
+    paths = _fingerprint_paths(directory)
+    offsets = np.load(offsets_path, allow_pickle=False)
+    if len(paths) != len(offsets) - 1 or any(p.stat().st_mtime_ns > built for p in paths):
+        return None
+
+    size = int(offsets[-1])
+    if data_path.stat().st_size != size * FINGERPRINT_DTYPE().itemsize:
+        raise ValueError(f"Fingerprint database in '{directory}' is inconsistent; rebuild the index.")
+    if size == 0:
+        # An empty file cannot be memory-mapped.
+        return np.empty(0, dtype=FINGERPRINT_DTYPE), offsets
+    return np.memmap(data_path, dtype=FINGERPRINT_DTYPE, mode="r", shape=(size,)), offsets
 
 
 def iter_video_paths(
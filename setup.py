@@ -0,0 +1,31 @@
+"""
+setup.py
+~~~~~~~~
+Builds the optional ``fast_l1`` C extension used by :mod:`fingerprinter`.
+
+The rest of the project runs straight from the source tree; this file only
+exists to compile the extension next to it::
+
+    python setup.py build_ext --inplace
+
+Set ``FAST_L1_NO_AVX2=1`` to build without the AVX2 kernel.
+"""
+
+import os
+
+from setuptools import Extension, setup
+
+
+define_macros = [("FAST_L1_NO_AVX2", "1")] if os.environ.get("FAST_L1_NO_AVX2") else []
+
+setup(
+    name="video-shazam-fast-l1",
+    ext_modules=[
+        Extension(
+            "fast_l1",
+            sources=["fast_l1.c"],
+            define_macros=define_macros,
+            extra_compile_args=["-O3"],
+        ),
+    ],
+)
@@ -0,0 +1,114 @@
+"""
+test_fast_l1.py
+~~~~~~~~~~~~~~~
+Check ``fast_l1.best_match_u8`` against a brute-force NumPy search.
+
+The extension is compiled into a temporary directory twice: once as shipped
+and once with ``FAST_L1_NO_AVX2``, so the SWAR and scalar kernels are
+covered even on machines where the AVX2 kernel would be selected.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import sysconfig
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+# Lengths around the 8/16/32-byte block sizes of the SWAR and AVX2 kernels.
+LENGTHS = [0, 1, 7, 8, 9, 15, 16, 17, 31, 32, 33, 47, 63, 64, 65, 100]
+
+
+def _build(out_dir: Path, no_avx2: bool):
+    """Compile fast_l1 into *out_dir* and import it from there."""
+    env = dict(os.environ)
+    env.pop("FAST_L1_NO_AVX2", None)
+    if no_avx2:
+        env["FAST_L1_NO_AVX2"] = "1"
+    subprocess.run(
+        [
+            sys.executable,
+            "setup.py",
+            "build_ext",
+            "--build-lib",
+            str(out_dir / "lib"),
+            "--build-temp",
+            str(out_dir / "temp"),
+        ],
+        cwd=REPO_DIR,
+        env=env,
+        check=True,
+        capture_output=True,
+    )
+    (path,) = (out_dir / "lib").glob("fast_l1*")
+    spec = importlib.util.spec_from_file_location("fast_l1", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session", params=["default", "no_avx2"])
+def fast_l1(request, tmp_path_factory):
+    cc = shlex.split(sysconfig.get_config_var("CC") or "cc")[0]
+    if shutil.which(cc) is None:
+        pytest.skip(f"C compiler '{cc}' not found")
+    no_avx2 = request.param == "no_avx2"
+    module = _build(tmp_path_factory.mktemp(request.param), no_avx2)
+    if no_avx2:
+        assert module.AVX2 == 0
+    return module
+
+
+def _brute_force(q: np.ndarray, r: np.ndarray) -> tuple[int, int]:
+    """Return ``(offset, distance)`` of the first best window, like best_match_u8."""
+    if len(q) > len(r):
+        return -1, -1
+    windows = np.lib.stride_tricks.sliding_window_view(r.astype(np.int64), len(q))
+    distances = np.abs(windows - q.astype(np.int64)).sum(axis=1)
+    best = int(distances.argmin())
+    return best, int(distances[best])
+
+
+@pytest.mark.parametrize("high", [0x80, 0x100], ids=["below-0x80", "full-range"])
+@pytest.mark.parametrize("m", LENGTHS)
+def test_matches_brute_force(fast_l1, m, high):
+    rng = np.random.default_rng(m * 1000 + high)
+    for n in sorted({m, m + 1, m + 13, 3 * m + 40}):
+        for _ in range(5):
+            q = rng.integers(0, high, m, dtype=np.uint8)
+            r = rng.integers(0, high, n, dtype=np.uint8)
+            assert fast_l1.best_match_u8(q, r) == _brute_force(q, r)
+
+
+@pytest.mark.parametrize("m", [m for m in LENGTHS if m > 0])
+def test_finds_planted_window(fast_l1, m):
+    rng = np.random.default_rng(m)
+    r = rng.integers(0, 0x100, 4 * m + 11, dtype=np.uint8)
+    offset = m + 3
+    q = r[offset : offset + m].copy()
+    assert fast_l1.best_match_u8(q, r) == _brute_force(q, r)
+    assert fast_l1.best_match_u8(q, r)[1] == 0
+
+
+def test_query_equal_to_reference(fast_l1):
+    rng = np.random.default_rng(0)
+    for m in LENGTHS:
+        q = rng.integers(0, 0x100, m, dtype=np.uint8)
+        r = rng.integers(0, 0x100, m, dtype=np.uint8)
+        assert fast_l1.best_match_u8(q, r) == _brute_force(q, r)
+        assert fast_l1.best_match_u8(q, q) == (0, 0)
+
+
+def test_query_longer_than_reference(fast_l1):
+    q = np.arange(10, dtype=np.uint8)
+    assert fast_l1.best_match_u8(q, q[:9]) == (-1, -1)